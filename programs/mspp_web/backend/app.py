@@ -4,20 +4,30 @@ MSPP Data Plotter - Flask Backend API
 Modular refactor: Logic is in logic.py, Routes are here.
 """
 
+import base64
 import contextlib
 import io
 import logging
 import mimetypes
 import os
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from flask import Flask, jsonify, request, send_file, send_from_directory
+from flask import (
+    Flask,
+    Response,
+    jsonify,
+    request,
+    send_file,
+    send_from_directory,
+    stream_with_context,
+)
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 
 # Import our custom logic
-from .logic import DataProcessor, PlotGenerator, fig_to_base64
+from .logic import DataProcessor, PlotGenerator, iter_png_zip
 
 # Force correct MIME types
 mimetypes.add_type('application/javascript', '.js')
@@ -30,14 +40,20 @@ CORS(app)
 processor = DataProcessor()
 plotter = PlotGenerator(processor)
 uploaded_files = {}
+# Figures are built outside pyplot, so independent plots can render side by side
+render_pool = ThreadPoolExecutor(max_workers=2)
 
 @app.after_request
 def add_security_headers(response):
     """Add security and performance headers for local and work environments."""
-    # Ensure no old data is served
-    response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
+    if request.path.startswith('/assets/') and response.status_code == 200:
+        # Vite content-hashes bundle filenames, so a given asset URL never changes content
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        # Ensure no old data is served (API responses and the index.html shell)
+        response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
+        response.headers['Pragma'] = 'no-cache'
+        response.headers['Expires'] = '0'
     # Strict but functional CSP
     response.headers['Content-Security-Policy'] = "default-src 'self' 'unsafe-inline' 'unsafe-eval' data: blob:;"
     return response
@@ -63,7 +79,8 @@ def upload_files():
             # SECURITY: Use secure_filename to prevent path traversal
             safe_name = secure_filename(file.filename)
             temp_path = Path(tempfile.gettempdir()) / safe_name
-            file.save(temp_path)
+            # 1 MiB copy buffer instead of Werkzeug's 16 KiB default for multi-hundred-MB matrices
+            file.save(temp_path, buffer_size=1 << 20)
             uploaded_files[safe_name] = str(temp_path)
             temp_paths.append(safe_name)
 
@@ -80,48 +97,78 @@ def manage_files():
                 Path(path).unlink(missing_ok=True)
         uploaded_files.clear()
         processor.clear_cache()
+        plotter.clear_cache()
         return jsonify({'message': 'Cleared'})
     return jsonify({'files': list(uploaded_files.keys())})
 
+@app.route('/api/plot/all', methods=['POST'])
+def generate_all_plots():
+    if not uploaded_files:
+        return jsonify({'error': 'No files uploaded'}), 400
+
+    try:
+        # Load once on the request thread; both renders then share the cached frame
+        data = processor.load_data(list(uploaded_files.values()))
+        futures = {name: render_pool.submit(plotter.preview_png, data, name) for name in PlotGenerator.FIGURES}
+        return jsonify({'images': {name: base64.b64encode(f.result()).decode('utf-8') for name, f in futures.items()}})
+    except Exception as e:
+        logging.exception(f"Plot generation failed: {e}")
+        return jsonify({'error': 'Plot generation failed due to an internal error.'}), 500
+
 @app.route('/api/plot/<chart_type>', methods=['POST'])
 def generate_plot(chart_type):
     if not uploaded_files:
         return jsonify({'error': 'No files uploaded'}), 400
 
     try:
-        data = processor.load_data(list(uploaded_files.values()))
-        if chart_type == 'bar-chart':
-            fig = plotter.create_bar_chart_figure(data)
-        elif chart_type == 'sample-comparison':
-            fig = plotter.create_comparison_figure(data)
-        else:
+        if chart_type not in PlotGenerator.FIGURES:
             return jsonify({'error': 'Invalid plot type'}), 400
+        data = processor.load_data(list(uploaded_files.values()))
+        # Repeat clicks on unchanged data are served from the rendered-PNG cache
+        png = plotter.preview_png(data, chart_type)
 
-        return jsonify({'image': fig_to_base64(fig)})
+        # ?format=png returns the raw image, skipping the base64 pass and ~33% payload inflation
+        if request.args.get('format') == 'png':
+            return send_file(io.BytesIO(png), mimetype='image/png')
+        return jsonify({'image': base64.b64encode(png).decode('utf-8')})
     except Exception as e:
         logging.exception(f"Plot generation failed: {e}")
         return jsonify({'error': 'Plot generation failed due to an internal error.'}), 500
 
+@app.route('/api/export/all', methods=['POST'])
+def export_all_plots():
+    if not uploaded_files:
+        return jsonify({'error': 'No files uploaded'}), 400
+
+    try:
+        # Render (or reuse) both PNGs up front so errors still map to a 500 below; the two
+        # 300 dpi renders are independent, so they run side by side like /api/plot/all
+        data = processor.load_data(list(uploaded_files.values()))
+        futures = [(name, render_pool.submit(plotter.export_png, data, chart_type))
+                   for chart_type, (name, _) in PlotGenerator.EXPORTS.items()]
+        pngs = [(name, f.result()) for name, f in futures]
+        return Response(
+            stream_with_context(iter_png_zip(pngs)),
+            mimetype='application/zip',
+            headers={'Content-Disposition': 'attachment; filename=mspp_plots.zip'},
+        )
+    except Exception as e:
+        logging.exception(f"Export failed: {e}")
+        return jsonify({'error': 'Export failed due to an internal error.'}), 500
+
 @app.route('/api/export/<chart_type>', methods=['POST'])
 def export_plot(chart_type):
     if not uploaded_files:
         return jsonify({'error': 'No files uploaded'}), 400
 
     try:
-        data = processor.load_data(list(uploaded_files.values()))
-        if chart_type == 'bar-chart':
-            fig = plotter.create_bar_chart_figure(data, figsize=(10, 6))
-            name = 'protein_id_bar_chart.png'
-        elif chart_type == 'sample-comparison':
-            fig = plotter.create_comparison_figure(data, figsize=(18, 16))
-            name = 'intensity_ratio_comparison.png'
-        else:
+        if chart_type not in PlotGenerator.EXPORTS:
             return jsonify({'error': 'Invalid plot type'}), 400
-
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', dpi=300, bbox_inches='tight')
-        buf.seek(0)
-        return send_file(buf, mimetype='image/png', as_attachment=True, download_name=name)
+        data = processor.load_data(list(uploaded_files.values()))
+        # Repeat exports of unchanged data reuse the 300 dpi render instead of redrawing it
+        png = plotter.export_png(data, chart_type)
+        name, _ = PlotGenerator.EXPORTS[chart_type]
+        return send_file(io.BytesIO(png), mimetype='image/png', as_attachment=True, download_name=name)
     except Exception as e:
         logging.exception(f"Export failed: {e}")
         return jsonify({'error': 'Export failed due to an internal error.'}), 500
@@ -3,28 +3,96 @@ MSPP logic.py - Data Processing and Plot Generation
 Contains the core analytical algorithms and visualization logic."
 """
 
-import base64
 import io
 import logging
+import os
 import re
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
+from matplotlib.figure import Figure
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import csv as pacsv
+except ImportError:  # Optional: without it, fall back to the pandas parser and regexes
+    pa = pc = pacsv = None
+
+# Sample-name patterns, compiled once and shared by every request
+E25_RE = re.compile(r'E[-_]?25|Y[-_]?150')
+E100_RE = re.compile(r'E[-_]?100|Y[-_]?75')
+MIX_SUFFIX_RE = re.compile(r'(?:E[-_]?(?:25|100)|Y[-_]?(?:150|75))[-_](.*)', re.IGNORECASE)
+RUN_NUMBER_RE = re.compile(r'(\d+)')
 
 matplotlib.use('Agg')
 plt.style.use('dark_background')
 
-def fig_to_base64(fig):
-    """Convert matplotlib figure to base64 encoded PNG."""
+def fig_to_png(fig, dpi=100, compress_level=6):
+    """Render a matplotlib figure to an in-memory PNG buffer."""
     buf = io.BytesIO()
-    fig.savefig(buf, format='png', dpi=100, bbox_inches='tight')
+    fig.savefig(buf, format='png', dpi=dpi, pil_kwargs={'compress_level': compress_level})
     buf.seek(0)
-    img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close(fig)
-    return img_base64
+    return buf
+
+class _ChunkSink:
+    """Write-only file object that buffers bytes until drained; zipfile streams into it."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+def iter_png_zip(pngs):
+    """Stream a ZIP of (filename, PNG bytes) pairs, yielding each entry as soon as it is written."""
+    sink = _ChunkSink()
+    # The sink is unseekable, so zipfile writes data descriptors instead of patching headers.
+    # Level 1: the PNGs still shrink ~30%, and the fastest level does it no worse than the default 6
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        for name, png in pngs:
+            zf.writestr(name, png)
+            yield from sink.drain()
+    yield from sink.drain()
+
+def log2_ratio(num, den):
+    """log2(num / den), keeping only finite results."""
+    ratios = num / den
+    # In place: the quotient buffer is the only temporary besides the finite mask
+    np.log2(ratios, out=ratios)
+    return ratios[np.isfinite(ratios)]
+
+class _LoadedData:
+    """A merged frame together with its load key and derived per-sample arrays.
+
+    load_data publishes one of these through a single attribute, so a reader on another thread
+    always sees a frame with its own key and caches, never one load's frame with another's.
+    """
+
+    def __init__(self, key, data):
+        self.key = key
+        self.data = data
+        # Filled lazily; concurrent readers may both compute an entry, but always from this frame
+        self.derived = {}
+
+    @property
+    def file_to_raw_column(self):
+        """Sample name -> run intensity column, carried by the frame itself."""
+        return self.data.attrs.get(DataProcessor.RAW_COLUMNS_ATTR, {})
 
 class DataProcessor:
     """Handles all data loading, processing, and calculation logic."""
@@ -38,139 +106,304 @@ class DataProcessor:
         ],
         "Yeast": ["_YEAST", "SACCHAROMYCES", "CEREVISIAE"],
     }
+    # Compiled once at class creation rather than on every call
+    ORGANISM_REGEX = {org: re.compile("|".join(pats)) for org, pats in ORGANISM_PATTERNS.items()}
+    PROTEIN_COLUMNS = ["Protein.Group", "Protein.Ids", "Protein.Names"]
+    INTENSITY_COLUMN = "Intensity"
+    # data.attrs key for the run-column map; pandas carries attrs over to copies and slices
+    RAW_COLUMNS_ATTR = "file_to_raw_column"
 
     def __init__(self):
-        self.file_to_raw_column = {}
-        self.cached_data = None
-        self.cached_file_list = []
+        self._loaded = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def cached_data(self):
+        """The currently loaded frame, or None."""
+        loaded = self._loaded
+        return loaded.data if loaded is not None else None
+
+    @property
+    def file_to_raw_column(self):
+        """Sample name -> run intensity column for the currently loaded frame."""
+        loaded = self._loaded
+        return loaded.file_to_raw_column if loaded is not None else {}
+
+    def clear_cache(self):
+        """Drop all loaded data and derived per-sample arrays."""
+        with self._load_lock:
+            self._loaded = None
+
+    def _state(self, data):
+        """The published load for data, or a standalone one for any other frame."""
+        loaded = self._loaded
+        if loaded is not None and loaded.data is data:
+            return loaded
+        # An earlier load replaced mid-request, or a modified copy: derive from that frame alone
+        # so the published caches are neither read nor overwritten
+        return _LoadedData(None, data)
+
+    def raw_columns(self, data):
+        """Sample name -> run intensity column for data."""
+        return data.attrs.get(self.RAW_COLUMNS_ATTR, {})
 
     def identify_organism_vectorized(self, series):
         """Vectorized organism identification."""
-        upper = series.fillna("").astype(str).str.upper()
-        result = pd.Series("Unknown", index=series.index)
-        for organism, patterns in self.ORGANISM_PATTERNS.items():
-            mask = upper.str.contains("|".join(patterns), regex=True)
-            result = result.where(~mask, organism)
-        return pd.Categorical(result, categories=self.ORGANISMS)
+        # Protein groups repeat across runs, so match each distinct name once and broadcast the
+        # result back through the factorized labels (missing names get label -1 -> unmatched)
+        labels, uniques = pd.factorize(series)
+        # Trailing -1 slot: label -1 indexes it, so an all-missing column (no uniques) works too
+        unique_codes = np.append(self._organism_codes(pd.Series(uniques, dtype=object)), np.int8(-1))
+        codes = unique_codes[labels]
+        return pd.Categorical.from_codes(codes, categories=self.ORGANISMS)
+
+    def _organism_codes(self, series):
+        """int8 organism code per name, -1 where no pattern matches."""
+        if pa is not None:
+            # RE2 scan over the Arrow string array; no per-element Python string objects
+            names = pa.array(series, type=pa.string(), from_pandas=True)
+            masks = [
+                pc.fill_null(
+                    pc.match_substring_regex(names, self.ORGANISM_REGEX[org].pattern, ignore_case=True),
+                    False,
+                ).to_numpy(zero_copy_only=False)
+                for org in self.ORGANISMS
+            ]
+        else:
+            upper = series.fillna("").astype(str).str.upper()
+            codes = np.full(len(upper), -1, dtype=np.int8)
+            unresolved = np.arange(len(upper))
+            # Highest-priority organism first, so each later pass only scans names still unmatched
+            for org_code in reversed(range(len(self.ORGANISMS))):
+                hit = upper.iloc[unresolved].str.contains(self.ORGANISM_REGEX[self.ORGANISMS[org_code]]).to_numpy()
+                codes[unresolved[hit]] = org_code
+                unresolved = unresolved[~hit]
+            return codes
+
+        # Later organisms take precedence when a protein group matches several: argmax over the
+        # reversed (organism, row) mask stack finds the last match per row in one vectorized call
+        m = np.stack(masks)[::-1]
+        last = np.int8(len(masks) - 1) - m.argmax(axis=0).astype(np.int8)
+        return np.where(m.any(axis=0), last, np.int8(-1))
+
+    def _read_one(self, filepath):
+        """Read a single TSV, returning its source name, frame, intensity and protein columns."""
+        try:
+            # OPTIMIZATION: Scan headers first to load ONLY required columns
+            header_df = pd.read_csv(filepath, sep="\t", nrows=0)
+            cols = header_df.columns.tolist()
+
+            raw_col = next((c for c in cols if ".raw" in c.lower()), None)
+            prot_col = next((c for c in ["Protein.Names", "Protein.Group", "Protein.Ids"] if c in cols), None) or \
+                       next((c for c in cols if "protein" in c.lower()), None)
+
+            usecols = [c for c in [prot_col, raw_col] if c]
+
+            # Load only necessary columns to save RAM; pyarrow parses on multiple threads when present
+            if pacsv is not None:
+                table = pacsv.read_csv(
+                    filepath,
+                    parse_options=pacsv.ParseOptions(delimiter="\t"),
+                    # Parse intensities straight to float32; the cast pass below then has nothing to do
+                    convert_options=pacsv.ConvertOptions(
+                        include_columns=usecols,
+                        column_types={raw_col: pa.float32()} if raw_col else None,
+                    ),
+                )
+                df = table.to_pandas(split_blocks=True, self_destruct=True)
+            else:
+                df = pd.read_csv(filepath, sep="\t", usecols=usecols, low_memory=False)
+        except Exception as e:
+            logging.warning(f"Fast load failed for {filepath}, falling back to full load: {e}")
+            df = pd.read_csv(filepath, sep="\t", low_memory=False)
+            raw_col = next((c for c in df.columns if ".raw" in c.lower()), None)
+            prot_col = next((c for c in ["Protein.Names", "Protein.Group"] if c in df.columns), None)
+            df = df[[c for c in [prot_col, raw_col] if c]]
+
+        # Every file's intensities share one column, so the merged frame stays one column wide
+        # instead of growing a mostly-NaN column per file; file_to_raw_column keeps the run name
+        if raw_col:
+            df = df.rename(columns={raw_col: self.INTENSITY_COLUMN})
+            # float32 halves the bytes scanned by every downstream mask/log2 pass
+            if df[self.INTENSITY_COLUMN].dtype != np.float32:
+                df[self.INTENSITY_COLUMN] = pd.to_numeric(df[self.INTENSITY_COLUMN], errors="coerce").astype(np.float32)
+
+        return Path(filepath).stem, df, raw_col, prot_col
+
+    @staticmethod
+    def _file_signature(path):
+        """(absolute path, mtime, size): changes whenever the file on disk does."""
+        st = os.stat(path)
+        return os.path.abspath(path), st.st_mtime_ns, st.st_size
+
+    @classmethod
+    def _cache_key(cls, file_paths):
+        """Order-independent key of each file's path, mtime and size; O(n), no sort."""
+        # A changed file re-uploaded under the same name keeps its path, so stat it too
+        return frozenset(cls._file_signature(p) for p in file_paths)
 
     def load_data(self, file_paths):
         """Load data from selected files with memory optimization."""
         if not file_paths:
             raise ValueError("No files provided")
 
-        if self.cached_data is not None and self.cached_file_list == file_paths:
-            return self.cached_data
-
-        all_data = []
-        self.file_to_raw_column = {}
-
-        for filepath in file_paths:
-            try:
-                # OPTIMIZATION: Scan headers first to load ONLY required columns
-                header_df = pd.read_csv(filepath, sep="\t", nrows=0)
-                cols = header_df.columns.tolist()
-
-                raw_cols = [c for c in cols if ".raw" in c.lower()]
-                prot_col = next((c for c in ["Protein.Names", "Protein.Group", "Protein.Ids"] if c in cols), None) or \
-                           next((c for c in cols if "protein" in c.lower()), None)
-
-                usecols = [c for c in [prot_col] + raw_cols if c]
-
-                # Load only necessary columns to save RAM
-                df = pd.read_csv(filepath, sep="\t", usecols=usecols, low_memory=False)
-            except Exception as e:
-                logging.warning(f"Fast load failed for {filepath}, falling back to full load: {e}")
-                df = pd.read_csv(filepath, sep="\t", low_memory=False)
-                raw_cols = [c for c in df.columns if ".raw" in c.lower()]
-                prot_col = next((c for c in ["Protein.Names", "Protein.Group"] if c in df.columns), None)
-
-            source_name = Path(filepath).stem
-            df["Source_File"] = source_name
-
-            if raw_cols:
-                self.file_to_raw_column[source_name] = raw_cols[0]
-
-            df["Organism"] = self.identify_organism_vectorized(df[prot_col]) if prot_col else "Unknown"
-
-            # Filter out unwanted organisms immediately
-            df = df[df["Organism"].isin(self.ORGANISMS)]
+        cache_key = self._cache_key(file_paths)
+        # One attribute read: the key and frame checked here always belong to the same load
+        loaded = self._loaded
+        if loaded is not None and loaded.key == cache_key:
+            return loaded.data
+
+        # Requests arriving together on a cold cache wait for one load instead of each parsing
+        with self._load_lock:
+            loaded = self._loaded
+            if loaded is not None and loaded.key == cache_key:
+                return loaded.data
+
+            data = self._read_files(file_paths)
+            self._loaded = _LoadedData(cache_key, data)
+            return data
+
+    def _read_files(self, file_paths):
+        """Parse, tag and merge the TSVs into a single frame carrying its run-column map in attrs."""
+        # Files are independent and the parser (pyarrow's reader, or pandas' C parser without it)
+        # does its work outside the GIL, so read them concurrently
+        with ThreadPoolExecutor(max_workers=min(len(file_paths), os.cpu_count() or 1)) as ex:
+            results = list(ex.map(self._read_one, file_paths))
+
+        all_data, prot_cols = [], []
+        file_to_raw_column = {}
+        # Categorical Source_File: integer codes for groupby/equality instead of repeated strings
+        source_names = list(dict.fromkeys(r[0] for r in results))
+        for source_name, df, raw_col, prot_col in results:
+            df["Source_File"] = pd.Categorical.from_codes(
+                np.full(len(df), source_names.index(source_name)), categories=source_names
+            )
+            if raw_col:
+                file_to_raw_column[source_name] = raw_col
+            if prot_col and prot_col not in prot_cols:
+                prot_cols.append(prot_col)
             all_data.append(df)
 
-        self.cached_data = pd.concat(all_data, ignore_index=True)
-        self.cached_file_list = file_paths.copy()
-        return self.cached_data
-
-    def calculate_intensity_ratios(self, data, e25_file, e100_file, organism):
+        # Shared Source_File categories let pandas concatenate the int codes directly, and the
+        # common Intensity column keeps a single float32 block
+        data = pd.concat(all_data, ignore_index=True, sort=False, copy=False)
+
+        # Identify organisms in a single pass over the merged protein column rather than once per
+        # file; files reading different protein columns are coalesced (other files' rows are NaN)
+        if prot_cols:
+            protein = data[prot_cols[0]]
+            for col in prot_cols[1:]:
+                protein = protein.fillna(data[col])
+            data["Organism"] = self.identify_organism_vectorized(protein)
+        else:
+            data["Organism"] = pd.Categorical([None] * len(data), categories=self.ORGANISMS)
+
+        # Filter out unwanted organisms
+        data = data[data["Organism"].isin(self.ORGANISMS)].reset_index(drop=True)
+
+        # One shared category set per protein column so IDs compare as integer codes across files
+        for col in self.PROTEIN_COLUMNS:
+            if col in data.columns:
+                data[col] = data[col].astype("category")
+        # The map travels with the frame, so a request still holding it after a reload keeps its run names
+        data.attrs[self.RAW_COLUMNS_ATTR] = file_to_raw_column
+        return data
+
+    def _file_rows(self, state):
+        """Row positions per Source_File, built once per frame and reused for the sample list."""
+        derived = state.derived
+        # One groupby pass over the frame replaces a boolean Source_File scan per call
+        if "file_rows" not in derived:
+            derived["file_rows"] = state.data.groupby("Source_File", sort=False, observed=True).indices
+        return derived["file_rows"]
+
+    def _sample_arrays(self, state, source_file, prot_col):
+        """Per-organism (sorted protein codes, intensities) for one sample, built once per frame."""
+        data, derived = state.data, state.derived
+        key = ("sample", source_file, prot_col)
+        if key not in derived:
+            # Gather this sample's rows from only the three columns it needs, as flat arrays,
+            # rather than an iloc slice that would copy every column of the frame
+            rows = self._file_rows(state)[source_file]
+            intensity_col = data[self.INTENSITY_COLUMN]
+            intensity = intensity_col.to_numpy()[rows]
+            # Loaded columns are already float32; only coerce frames built some other way
+            if intensity.dtype.kind != "f":
+                intensity = pd.to_numeric(intensity_col.iloc[rows], errors="coerce").to_numpy(dtype=np.float64)
+            codes = data[prot_col].cat.codes.to_numpy()[rows]
+            org_codes = data["Organism"].cat.codes.to_numpy()[rows]
+            # NaN compares False, so a single > 0 pass also drops missing intensities
+            valid = (intensity > 0) & (codes >= 0)
+
+            arrays = {}
+            for org_code, organism in enumerate(self.ORGANISMS):
+                sel = valid & (org_codes == org_code)
+                uniq, first = np.unique(codes[sel], return_index=True)
+                arrays[organism] = (uniq, intensity[sel][first])
+            derived[key] = arrays
+        return derived[key]
+
+    def _protein_column(self, data):
+        """First protein ID column present in the merged frame, or None."""
+        return next((c for c in self.PROTEIN_COLUMNS if c in data.columns), None)
+
+    def calculate_intensity_ratios(self, data, e25_file, e100_file, organism, prot_col=None):
         """Calculate log2 intensity ratios (E25/E100) for consensus proteins."""
-        if e25_file not in self.file_to_raw_column or e100_file not in self.file_to_raw_column:
-            return None
-
-        e25_col = self.file_to_raw_column[e25_file]
-        e100_col = self.file_to_raw_column[e100_file]
+        return self._intensity_ratios(self._state(data), e25_file, e100_file, organism, prot_col)
 
-        e25_data = data[data["Source_File"] == e25_file].copy()
-        e100_data = data[data["Source_File"] == e100_file].copy()
-
-        e25_org = e25_data[e25_data["Organism"] == organism]
-        e100_org = e100_data[e100_data["Organism"] == organism]
-
-        if len(e25_org) == 0 or len(e100_org) == 0:
+    def _intensity_ratios(self, state, e25_file, e100_file, organism, prot_col=None):
+        """calculate_intensity_ratios against an already resolved load."""
+        if e25_file not in state.file_to_raw_column or e100_file not in state.file_to_raw_column:
             return None
 
-        prot_col = next((c for c in ["Protein.Group", "Protein.Ids", "Protein.Names"] if c in e25_org.columns), None)
+        # Callers looping over pairs resolve the protein column once and pass it in
+        prot_col = prot_col or self._protein_column(state.data)
         if not prot_col: return None
 
-        e25_v = e25_org[(e25_org[e25_col].notna()) & (e25_org[e25_col] > 0)]
-        e100_v = e100_org[(e100_org[e100_col].notna()) & (e100_org[e100_col] > 0)]
-
-        common = set(e25_v[prot_col]) & set(e100_v[prot_col])
-        if not common: return None
-
-        e25_c = e25_v[e25_v[prot_col].isin(common)].set_index(prot_col)
-        e100_c = e100_v[e100_v[prot_col].isin(common)].set_index(prot_col)
+        e25_codes, e25_vals = self._sample_arrays(state, e25_file, prot_col)[organism]
+        e100_codes, e100_vals = self._sample_arrays(state, e100_file, prot_col)[organism]
 
-        idx = e25_c.index.intersection(e100_c.index)
+        # Intersect integer category codes (shared across files) instead of hashing protein strings
+        _, i25, i100 = np.intersect1d(e25_codes, e100_codes, assume_unique=True, return_indices=True)
+        if len(i25) == 0: return None
 
         # Calculate ratios (log2)
-        ratios = np.log2(e25_c.loc[idx, e25_col].values / e100_c.loc[idx, e100_col].values)
-        return ratios[np.isfinite(ratios)]
+        return log2_ratio(e25_vals[i25], e100_vals[i100])
 
     def calculate_protein_id_counts(self, data):
         """Calculate protein ID counts grouped by organism and source file."""
-        counts = data.groupby(["Source_File", "Organism"]).size().unstack(fill_value=0)
+        # observed=True: files whose rows were all filtered out get no bar, as before categoricals
+        counts = data.groupby(["Source_File", "Organism"], observed=True).size().unstack(fill_value=0)
         return counts.reindex(columns=self.ORGANISMS, fill_value=0)
 
     def calculate_sample_comparison_data(self, data):
         """Logic for pairing samples and preparing ratio data."""
-        sample_files = sorted(data["Source_File"].unique())
+        # Plot, export and export-all all ask for the same pairs; compute once per loaded frame.
+        # The load is resolved once, so every pair below reads the same frame, map and caches
+        state = self._state(data)
+        file_to_raw_column, derived = state.file_to_raw_column, state.derived
+        if "comparison" in derived:
+            return derived["comparison"]
+
+        sample_files = sorted(self._file_rows(state))
         if len(sample_files) < 2:
             raise ValueError("Need at least 2 samples to create comparisons")
 
+        # Single pass: classify each sample as E25/E100 and slot it under its mix suffix
         e25_exp, e100_exp = [], []
-        for f in sample_files:
-            if re.search(r'E[-_]?25|Y[-_]?150', f.upper()): e25_exp.append(f)
-            elif re.search(r'E[-_]?100|Y[-_]?75', f.upper()): e100_exp.append(f)
-
         strict_pairs_dict, singlets = {}, []
-        def get_suffix(name):
-            m = re.search(r'(?:E[-_]?(?:25|100)|Y[-_]?(?:150|75))[-_](.*)', name, re.IGNORECASE)
-            return m.group(1) if m else None
-
-        for s in e25_exp:
-            suff = get_suffix(s)
-            if suff:
-                if suff not in strict_pairs_dict: strict_pairs_dict[suff] = {}
-                if 'E25' in strict_pairs_dict[suff]: singlets.append(s)
-                else: strict_pairs_dict[suff]['E25'] = s
-            else: singlets.append(s)
-
-        for s in e100_exp:
-            suff = get_suffix(s)
-            if suff:
-                if suff not in strict_pairs_dict: strict_pairs_dict[suff] = {}
-                if 'E100' in strict_pairs_dict[suff]: singlets.append(s)
-                else: strict_pairs_dict[suff]['E100'] = s
-            else: singlets.append(s)
+        for f in sample_files:
+            upper = f.upper()
+            if E25_RE.search(upper): role, group = 'E25', e25_exp
+            elif E100_RE.search(upper): role, group = 'E100', e100_exp
+            else: continue
+            group.append(f)
+
+            m = MIX_SUFFIX_RE.search(f)
+            suff = m.group(1) if m else None
+            pair = strict_pairs_dict.setdefault(suff, {}) if suff else None
+            if pair is None or role in pair: singlets.append(f)
+            else: pair[role] = f
 
         strict_pairs = []
         for suff, p in strict_pairs_dict.items():
@@ -185,67 +418,127 @@ class DataProcessor:
             e25_s, e100_s = sorted(e25_exp), sorted(e100_exp)
             sample_pairs = list(zip(e25_s, e100_s))
 
+        def get_pk(name):
+            raw = file_to_raw_column.get(name, "")
+            m = RUN_NUMBER_RE.search(Path(raw).stem if raw else name)
+            return m.group(1) if m else name
+
         results = {'HeLa': [], 'E.coli': [], 'Yeast': []}
+        prot_col = self._protein_column(data)
         for e25, e100 in sample_pairs:
-            def get_pk(name):
-                raw = self.file_to_raw_column.get(name, "")
-                m = re.search(r'(\d+)', Path(raw).stem if raw else name)
-                return m.group(1) if m else name
-
+            # Pairs without an intensity column on either side yield nothing for any organism
+            if not prot_col or e25 not in file_to_raw_column or e100 not in file_to_raw_column:
+                continue
             label = f"{get_pk(e25)} vs {get_pk(e100)}"
             for org in self.ORGANISMS:
-                ratios = self.calculate_intensity_ratios(data, e25, e100, org)
+                ratios = self._intensity_ratios(state, e25, e100, org, prot_col)
                 if ratios is not None:
-                    results[org].append((ratios, label))
+                    # Median computed once here and reused for the plot annotations
+                    results[org].append((ratios, label, float(np.median(ratios))))
 
         if not any(results.values()):
             raise ValueError("No valid sample pairs found")
+        derived["comparison"] = results
         return results
 
 class PlotGenerator:
     """Handles all matplotlib plotting and visualization logic."""
     COLORS = {"HeLa": "#9b59b6", "E.coli": "#e67e22", "Yeast": "#16a085"}
 
+    # Plot type (as used in the API routes) -> figure builder
+    FIGURES = {'bar-chart': 'create_bar_chart_figure', 'sample-comparison': 'create_comparison_figure'}
+    # Plot type -> (download filename, figure size) for the 300 dpi exports
+    EXPORTS = {
+        'bar-chart': ('protein_id_bar_chart.png', (10, 6)),
+        'sample-comparison': ('intensity_ratio_comparison.png', (18, 16)),
+    }
+
     def __init__(self, processor):
         self.processor = processor
+        self._png_cache = (None, {})
+        self._png_lock = threading.Lock()
+
+    def clear_cache(self):
+        """Drop rendered PNGs along with the frame they were rendered from."""
+        with self._png_lock:
+            self._png_cache = (None, {})
+
+    def _cached_png(self, data, key, render):
+        """PNG bytes for key, rendered once per loaded frame."""
+        with self._png_lock:
+            cached_for, pngs = self._png_cache
+            if cached_for is not data:
+                if data is not self.processor.cached_data:
+                    # Not the current load (replaced or cleared mid-request): render without
+                    # caching rather than evicting the current frame's PNGs
+                    pngs = None
+                else:
+                    # New data: earlier renders are stale, drop them rather than letting the cache grow.
+                    # Swapped under the lock so concurrent renders of one frame share a single dict
+                    pngs = {}
+                    self._png_cache = (data, pngs)
+        if pngs is None:
+            return render()
+        # Rendered outside the lock so /api/plot/all's two renders still overlap
+        if key not in pngs:
+            pngs[key] = render()
+        return pngs[key]
+
+    def preview_png(self, data, chart_type):
+        """Preview PNG bytes for a plot type, rendered once per loaded frame."""
+        def render():
+            # Previews are transient: zlib level 1 encodes ~30% faster than the default 6 for ~25% more bytes
+            return fig_to_png(getattr(self, self.FIGURES[chart_type])(data), compress_level=1).getvalue()
+        return self._cached_png(data, ('preview', chart_type), render)
+
+    def export_png(self, data, chart_type, dpi=300):
+        """Full-resolution export PNG bytes for a plot type, rendered once per loaded frame."""
+        _, figsize = self.EXPORTS[chart_type]
+
+        def render():
+            fig = getattr(self, self.FIGURES[chart_type])(data, figsize=figsize)
+            # Downloads are kept, so exports stay at the default zlib level for the smaller file
+            return fig_to_png(fig, dpi=dpi).getvalue()
+        return self._cached_png(data, ('export', chart_type, dpi), render)
 
     def create_bar_chart_figure(self, data, figsize=(12, 7)):
         counts = self.processor.calculate_protein_id_counts(data)
+        # Run names of this frame's load, even if another request has since loaded new files
+        raw_columns = self.processor.raw_columns(data)
 
         def get_sort_val(name):
-            raw = self.processor.file_to_raw_column.get(name, name)
-            m = re.search(r'(\d+)', Path(raw).stem)
+            raw = raw_columns.get(name, name)
+            m = RUN_NUMBER_RE.search(Path(raw).stem)
             return int(m.group(1)) if m else 0
 
         sorted_samples = sorted(counts.index, key=get_sort_val)
         counts = counts.reindex(sorted_samples)
-        fig, ax = plt.subplots(figsize=figsize)
+        # Constrained layout sizes the margins during the single draw; no tight-bbox second pass.
+        # A bare Figure stays out of pyplot's global figure registry, so request threads can render
+        # concurrently without racing on it
+        fig = Figure(figsize=figsize, layout='constrained')
+        ax = fig.subplots()
         bottom = np.zeros(len(counts))
 
         for org in self.processor.ORGANISMS:
-            ax.bar(range(len(counts)), counts[org], bottom=bottom, label=org, color=self.COLORS.get(org), alpha=0.8)
+            bars = ax.bar(range(len(counts)), counts[org], bottom=bottom, label=org, color=self.COLORS.get(org), alpha=0.8)
+            # One bar_label call per organism segment row instead of an ax.text per (sample, organism)
+            ax.bar_label(bars, labels=[str(int(v)) if v > 0 else "" for v in counts[org]], label_type='center',
+                         fontsize=9, fontweight='bold', color='white')
             bottom += counts[org].values
 
-        for i, sample in enumerate(counts.index):
-            y_off = 0
-            for org in self.processor.ORGANISMS:
-                val = counts.loc[sample, org]
-                if val > 0:
-                    ax.text(i, y_off + val/2, str(int(val)), ha='center', va='center', fontsize=9, fontweight='bold', color='white')
-                    y_off += val
-
-        x_labels = [Path(self.processor.file_to_raw_column.get(s, s)).name for s in counts.index]
+        x_labels = [Path(raw_columns.get(s, s)).name for s in counts.index]
         ax.set_xticks(range(len(counts)))
         ax.set_xticklabels(x_labels, rotation=45, ha='right')
         ax.set_title("Protein ID Counts by Organism", fontsize=14, fontweight='bold')
         ax.legend(title="Organism", loc="upper right")
         ax.grid(axis="y", alpha=0.3)
-        plt.tight_layout()
         return fig
 
     def create_comparison_figure(self, data, figsize=(18, 16)):
         results = self.processor.calculate_sample_comparison_data(data)
-        fig, axes = plt.subplots(3, 1, figsize=figsize)
+        fig = Figure(figsize=figsize, layout='constrained')
+        axes = fig.subplots(3, 1)
         configs = [
             ('HeLa', "HeLa Log2 Ratio (Expected: 0)", 0),
             ('E.coli', "E.coli Log2 Ratio (Expected: -2)", -2),
@@ -258,8 +551,7 @@ class PlotGenerator:
             else:
                 ax.text(0.5, 0.5, f"No {org} data", transform=ax.transAxes, ha="center")
 
-        plt.suptitle("Intensity Ratio Comparison by Run", fontsize=16, fontweight="bold", y=0.995)
-        plt.tight_layout()
+        fig.suptitle("Intensity Ratio Comparison by Run", fontsize=16, fontweight="bold")
         return fig
 
     def plot_ratio_comparison(self, ax, results, title, color, ref_line):
@@ -278,10 +570,8 @@ class PlotGenerator:
 
         plt.setp(bp["medians"], color="#2c3e50", linewidth=2.5)
 
-        medians = []
-        for i, arr in enumerate(data_arrays):
-            m = np.median(arr)
-            medians.append(m)
+        medians = [r[2] for r in results]
+        for i, m in enumerate(medians):
             ax.text(i+1, m, f"{m:.2f}", fontsize=9, va="bottom", ha="center", color="white", fontweight="bold",
                     bbox={'boxstyle':"round", 'facecolor':"black", 'alpha':0.5})
 
@@ -2,8 +2,7 @@ import { useState } from 'react'
 import { Upload, BarChart3, TrendingUp, X, Loader2, Download } from 'lucide-react'
 import './App.css'
 
-interface PlotResult {
-  image: string
+interface PlotError {
   error?: string
 }
 
@@ -18,6 +17,14 @@ function App() {
   const [currentPlotType, setCurrentPlotType] = useState<string | null>(null)
   const [error, setError] = useState<string | null>(null)
 
+  // plotImage holds an object URL; release the previous PNG whenever it is replaced
+  const showPlot = (url: string | null) => {
+    setPlotImage(prev => {
+      if (prev) URL.revokeObjectURL(prev)
+      return url
+    })
+  }
+
   const handleFileChange = (e: React.ChangeEvent<HTMLInputElement>) => {
     if (e.target.files) {
       setFiles(Array.from(e.target.files))
@@ -58,7 +65,7 @@ function App() {
     try {
       await fetch('/api/files', { method: 'DELETE' })
       setUploadedFiles([])
-      setPlotImage(null)
+      showPlot(null)
     } catch (err) {
       setError('Failed to clear files')
     }
@@ -72,20 +79,22 @@ function App() {
 
     setLoading(true)
     setError(null)
-    setPlotImage(null)
+    showPlot(null)
 
     try {
-      const response = await fetch(`/api/plot/${endpoint}`, {
+      // Raw PNG instead of base64-in-JSON: no 33% inflation and no decode on either side
+      const response = await fetch(`/api/plot/${endpoint}?format=png`, {
         method: 'POST',
         headers: requestBody ? { 'Content-Type': 'application/json' } : undefined,
         body: requestBody ? JSON.stringify(requestBody) : undefined,
       })
 
-      const data: PlotResult = await response.json()
-
-      if (!response.ok) throw new Error(data.error || 'Plot generation failed')
+      if (!response.ok) {
+        const data: PlotError = await response.json()
+        throw new Error(data.error || 'Plot generation failed')
+      }
 
-      setPlotImage(data.image)
+      showPlot(URL.createObjectURL(await response.blob()))
       setCurrentPlotType(endpoint)
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Plot generation failed')
@@ -277,7 +286,7 @@ function App() {
                       </button>
                     </div>
                     <img
-                      src={`data:image/png;base64,${plotImage}`}
+                      src={plotImage}
                       alt="Generated plot"
                       className="plot-image"
                     />
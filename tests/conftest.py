@@ -0,0 +1,91 @@
+"""Shared fixtures for the MSPP web backend tests: small DIA-NN style TSVs and a Flask test client."""
+
+import io
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Protein group -> organism it should be classified as (None: filtered out on load)
+PROTEIN_ORGANISMS = {
+    **{f"H{i}_HUMAN": "HeLa" for i in range(8)},
+    **{f"E{i}_ECOLI": "E.coli" for i in range(6)},
+    **{f"Y{i}_YEAST": "Yeast" for i in range(6)},
+    "H9_HUMAN;Y9_YEAST": "Yeast",
+    "M1_MOUSE": None,
+    "M2_MOUSE": None,
+}
+# Expected E25/E100 intensity ratio per organism
+MIX_RATIOS = {"HeLa": 1.0, "E.coli": 0.25, "Yeast": 2.0, None: 1.0}
+# Sample (file stem) -> run intensity column; E25/E100 pairs share a replicate suffix
+SAMPLES = {
+    "E25_rep1": "run101.raw",
+    "E100_rep1": "run102.raw",
+    "E25_rep2": "run103.raw",
+    "E100_rep2": "run104.raw",
+}
+
+
+def make_samples(seed=0):
+    """One frame per sample, with a few missing, zero and absent intensities."""
+    rng = np.random.default_rng(seed)
+    proteins = list(PROTEIN_ORGANISMS)
+    base = rng.uniform(1e5, 1e7, len(proteins))
+    frames = {}
+    for stem, raw_col in SAMPLES.items():
+        scale = np.array([MIX_RATIOS[PROTEIN_ORGANISMS[p]] for p in proteins]) if stem.startswith("E25") else 1.0
+        intensity = base * scale * rng.uniform(0.8, 1.25, len(proteins))
+        intensity[rng.choice(len(proteins), 2, replace=False)] = np.nan
+        intensity[rng.choice(len(proteins), 1)] = 0.0
+        df = pd.DataFrame({"Protein.Group": proteins, "Genes": [p.split("_")[0] for p in proteins], raw_col: intensity})
+        # Each file misses one protein entirely
+        frames[stem] = df.drop(index=rng.integers(len(df))).reset_index(drop=True)
+    return frames
+
+
+def to_tsv(df):
+    return df.to_csv(sep="\t", index=False).encode()
+
+
+@pytest.fixture
+def samples():
+    return make_samples()
+
+
+@pytest.fixture
+def sample_paths(tmp_path, samples):
+    """The sample frames written to TSVs under tmp_path."""
+    paths = []
+    for stem, df in samples.items():
+        path = tmp_path / f"{stem}.tsv"
+        path.write_bytes(to_tsv(df))
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Flask test client whose uploads land in tmp_path; app state is cleared around each test."""
+    from programs.mspp_web.backend import app as app_module
+
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(upload_dir))
+    client = app_module.app.test_client()
+    client.delete("/api/files")
+    yield client
+    client.delete("/api/files")
+
+
+@pytest.fixture
+def upload(client):
+    """POST {stem: frame} to /api/upload as TSV files."""
+    def post(frames):
+        files = [(io.BytesIO(to_tsv(df)), f"{stem}.tsv") for stem, df in frames.items()]
+        return client.post("/api/upload", data={"files": files}, content_type="multipart/form-data")
+    return post
@@ -0,0 +1,74 @@
+"""Flask routes of the MSPP web backend (programs/mspp_web/backend/app.py)."""
+
+import io
+import os
+import zipfile
+
+import numpy as np
+
+from programs.mspp_web.backend import app as app_module
+from programs.mspp_web.backend.logic import PlotGenerator
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def intensities(stem):
+    data = app_module.processor.cached_data
+    return np.sort(data.loc[data["Source_File"] == stem, "Intensity"].dropna().to_numpy())
+
+
+def test_reupload_changed_file_reloads(client, upload, samples):
+    assert upload(samples).status_code == 200
+    assert client.post("/api/plot/bar-chart?format=png").status_code == 200
+    first = app_module.processor.cached_data
+    before = intensities("E25_rep1")
+
+    # Same name, so the same upload path: only the file's mtime and size tell the versions apart
+    changed = samples["E25_rep1"].copy()
+    changed["run101.raw"] *= 2
+    path = app_module.uploaded_files["E25_rep1.tsv"]
+    mtime = os.stat(path).st_mtime_ns
+    assert upload({"E25_rep1": changed}).status_code == 200
+    # A rewrite within one filesystem clock tick could keep the old mtime
+    os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+
+    assert client.post("/api/plot/bar-chart?format=png").status_code == 200
+    assert app_module.processor.cached_data is not first
+    np.testing.assert_allclose(intensities("E25_rep1"), before * 2, rtol=1e-6)
+
+
+def test_unchanged_files_reuse_loaded_frame(client, upload, samples):
+    upload(samples)
+    client.post("/api/plot/bar-chart?format=png")
+    first = app_module.processor.cached_data
+    client.post("/api/plot/bar-chart?format=png")
+    assert app_module.processor.cached_data is first
+
+
+def test_delete_files_drops_cached_pngs(client, upload, samples):
+    upload(samples)
+    response = client.post("/api/plot/all")
+    assert response.status_code == 200
+    assert set(response.get_json()["images"]) == set(PlotGenerator.FIGURES)
+    cached_for, pngs = app_module.plotter._png_cache
+    assert cached_for is app_module.processor.cached_data
+    # Both concurrent renders land in the same cache
+    assert set(pngs) == {("preview", name) for name in PlotGenerator.FIGURES}
+
+    assert client.delete("/api/files").status_code == 200
+    assert app_module.processor.cached_data is None
+    assert app_module.plotter._png_cache == (None, {})
+    assert client.get("/api/files").get_json() == {"files": []}
+
+
+def test_export_all_returns_valid_zip(client, upload, samples):
+    upload(samples)
+    response = client.post("/api/export/all")
+    assert response.status_code == 200
+    assert response.mimetype == "application/zip"
+
+    with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == [name for name, _ in PlotGenerator.EXPORTS.values()]
+        for name in zf.namelist():
+            assert zf.read(name).startswith(PNG_SIGNATURE)
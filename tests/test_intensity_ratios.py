@@ -0,0 +1,59 @@
+"""Intensity ratios and sample comparisons in the MSPP web backend (programs/mspp_web/backend/logic.py)."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import PROTEIN_ORGANISMS, SAMPLES
+
+from programs.mspp_web.backend.logic import DataProcessor
+
+PAIRS = [("E25_rep1", "E100_rep1", "101 vs 102"), ("E25_rep2", "E100_rep2", "103 vs 104")]
+
+
+def baseline_ratios(samples, e25, e100, organism):
+    """The original algorithm: log2(E25/E100) over proteins with a positive intensity in both files."""
+    both = pd.concat(
+        [samples[s].set_index("Protein.Group")[SAMPLES[s]] for s in (e25, e100)], axis=1, join="inner"
+    ).dropna()
+    both = both[(both > 0).all(axis=1) & np.array([PROTEIN_ORGANISMS[p] == organism for p in both.index])]
+    ratios = np.log2(both.iloc[:, 0] / both.iloc[:, 1]).to_numpy()
+    return np.sort(ratios[np.isfinite(ratios)])
+
+
+@pytest.fixture
+def loaded(sample_paths):
+    processor = DataProcessor()
+    return processor, processor.load_data(sample_paths)
+
+
+def test_comparison_matches_baseline(loaded, samples):
+    processor, data = loaded
+    results = processor.calculate_sample_comparison_data(data)
+    for organism in DataProcessor.ORGANISMS:
+        assert [label for _, label, _ in results[organism]] == [label for _, _, label in PAIRS]
+        for (ratios, _, median), (e25, e100, _) in zip(results[organism], PAIRS):
+            expected = baseline_ratios(samples, e25, e100, organism)
+            # Intensities load as float32, so allow for its rounding
+            np.testing.assert_allclose(np.sort(ratios), expected, atol=1e-5)
+            assert median == pytest.approx(np.median(expected), abs=1e-5)
+
+
+def test_ratios_follow_modified_copy(loaded):
+    processor, data = loaded
+    before = processor.calculate_intensity_ratios(data, "E25_rep1", "E100_rep1", "HeLa")
+
+    scaled = data.copy()
+    scaled.loc[(scaled["Source_File"] == "E25_rep1").to_numpy(), "Intensity"] *= 4
+    np.testing.assert_allclose(
+        processor.calculate_intensity_ratios(scaled, "E25_rep1", "E100_rep1", "HeLa"), before + 2, atol=1e-5
+    )
+    medians = [m for _, _, m in processor.calculate_sample_comparison_data(scaled)["HeLa"]]
+    assert medians[0] == pytest.approx(np.median(before) + 2, abs=1e-5)
+
+    # The copy's arrays must not leak into the loaded frame's cache either
+    np.testing.assert_array_equal(processor.calculate_intensity_ratios(data, "E25_rep1", "E100_rep1", "HeLa"), before)
+
+
+def test_unknown_sample_has_no_ratios(loaded):
+    processor, data = loaded
+    assert processor.calculate_intensity_ratios(data, "E25_rep1", "missing", "HeLa") is None
@@ -0,0 +1,83 @@
+"""Organism classification in the MSPP web backend (programs/mspp_web/backend/logic.py)."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from programs.mspp_web.backend import logic  # noqa: E402
+from programs.mspp_web.backend.logic import DataProcessor  # noqa: E402
+
+NAMES = [
+    "P12345_HUMAN",
+    "sp|P0A7V8|RS4_ECOLI",
+    "Q12345_YEAST",
+    "Homo_sapiens protein",
+    "Escherichia coli protein",
+    "Saccharomyces cerevisiae protein",
+    "p99999_human",  # lower case still matches
+    "A_HUMAN;B_ECOLI",  # mixed groups: priority Yeast > E.coli > HeLa, whatever the order
+    "C_YEAST;A_HUMAN",
+    "A_HUMAN;B_YEAST",
+    "B_ECOLI;C_YEAST",
+    "A_HUMAN;B_ECOLI;C_YEAST",
+    "P00000_MOUSE",
+    None,
+    np.nan,
+    "P12345_HUMAN",  # repeated names map the same way
+]
+EXPECTED = [
+    "HeLa", "E.coli", "Yeast", "HeLa", "E.coli", "Yeast", "HeLa",
+    "E.coli", "Yeast", "Yeast", "Yeast", "Yeast", None, None, None, "HeLa",
+]
+
+ENGINES = ["pyarrow", "regex"]
+
+
+@pytest.fixture(params=ENGINES)
+def processor(request, monkeypatch):
+    """DataProcessor running the given classification engine."""
+    if request.param == "pyarrow":
+        if logic.pa is None:
+            pytest.skip("pyarrow not installed")
+    else:
+        monkeypatch.setattr(logic, "pa", None)
+    return DataProcessor()
+
+
+def classify(processor, names):
+    return list(processor.identify_organism_vectorized(pd.Series(names, dtype=object)).astype(object))
+
+
+def test_organism_priority(processor):
+    result = classify(processor, NAMES)
+    assert [None if pd.isna(r) else r for r in result] == EXPECTED
+
+
+def test_all_missing_names(processor):
+    result = processor.identify_organism_vectorized(pd.Series([np.nan, np.nan, None], dtype=object))
+    assert list(result.categories) == DataProcessor.ORGANISMS
+    assert result.isna().all()
+
+
+def test_empty_series(processor):
+    assert len(processor.identify_organism_vectorized(pd.Series([], dtype=object))) == 0
+
+
+def test_engines_agree(monkeypatch):
+    if logic.pa is None:
+        pytest.skip("pyarrow not installed")
+    rng = np.random.default_rng(0)
+    tokens = ["_HUMAN", "_ECOLI", "_ECO2", "_SHIF", "_YEAST", "_MOUSE", "CEREVISIAE", "homo_sapiens", ""]
+    names = [
+        ";".join(f"P{rng.integers(1e5)}{rng.choice(tokens)}" for _ in range(rng.integers(1, 4)))
+        for _ in range(2000)
+    ]
+    fast = classify(DataProcessor(), names)
+    monkeypatch.setattr(logic, "pa", None)
+    fallback = classify(DataProcessor(), names)
+    assert [None if pd.isna(r) else r for r in fast] == [None if pd.isna(r) else r for r in fallback]